@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('data', 'data')],
-    hiddenimports=['PIL', 'reportlab', 'barcode', 'argparse'],
+    hiddenimports=['PIL', 'reportlab', 'argparse'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -25,7 +25,6 @@ def build_executable():
         '--add-data=data;data',  # Добавляем папку с ресурсами
         '--hidden-import=PIL',
         '--hidden-import=reportlab',
-        '--hidden-import=barcode',
         '--hidden-import=argparse',  # Добавляем новую зависимость
     ]
     
@@ -1,19 +1,15 @@
 import csv
 import os
 import sys
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+# Тяжелые модули reportlab и PIL импортируются внутри функций, чтобы
+# разбор аргументов и проверка ресурсов не ждали их загрузки
 from reportlab.lib.units import mm
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase import pdfmetrics
-import barcode
-from barcode.writer import ImageWriter
-from PIL import Image, ImageFont, ImageDraw
 import random
 import logging
 import traceback
 from datetime import datetime
 import argparse
+from functools import lru_cache
 
 # --- ПАРАМЕТРЫ ---
 if getattr(sys, 'frozen', False):
@@ -81,14 +77,13 @@ def load_data(csv_file):
         logging.error(error_msg)
         raise FileNotFoundError(error_msg)
     try:
-        data = []
-        with open(csv_file, newline="", encoding="utf-8") as f:
+        # Читаем файл крупными блоками по 1 МБ
+        with open(csv_file, newline="", encoding="utf-8", buffering=1 << 20) as f:
             reader = csv.reader(f)
             header = next(reader)
-            for row in reader:
-                if len(row) == 3:
-                    if not row[0].strip().startswith("#"):
-                        data.append((row[0].strip(), row[1].strip(), row[2].strip()))
+            data = [(row[0].strip(), row[1].strip(), row[2].strip())
+                    for row in reader
+                    if len(row) == 3 and not row[0].lstrip().startswith("#")]
         logging.info(f"Успешно загружено {len(data)} записей")
         return header, data
     except Exception as e:
@@ -96,17 +91,25 @@ def load_data(csv_file):
         raise
 
 
+# Вклад ASCII-байта цифры в контрольную сумму EAN-13 для нечетных (вес 1)
+# и четных (вес 3) позиций; другие байты отсекает проверка в calculate_check_digit
+_EAN_ODD = dict(zip(b"0123456789", range(10)))
+_EAN_EVEN = {b: 3 * w for b, w in _EAN_ODD.items()}
+
+
 def calculate_check_digit(number):
     """Вычисляет контрольную цифру для EAN-13"""
-    sum_odd = sum(int(digit) for digit in number[::2])
-    sum_even = sum(int(digit) for digit in number[1::2])
-    check_digit = (10 - (sum_odd + 3 * sum_even) % 10) % 10
+    if not (number.isascii() and number.isdigit()):
+        raise ValueError(f"Номер должен состоять только из цифр: {number}")
+    data = number.encode("ascii")
+    total = sum(_EAN_ODD[b] for b in data[::2]) + sum(_EAN_EVEN[b] for b in data[1::2])
+    check_digit = (10 - total % 10) % 10
     return str(check_digit)
 
 
-def generate_barcode(number, filename):
-    """Генерирует штрихкод EAN-13"""
-    logging.info(f"Генерация штрихкода для номера: {number}")
+def normalize_ean13(number):
+    """Дополняет номер до корректного кода EAN-13"""
+    logging.debug(f"Нормализация номера EAN-13: {number}")
     try:
         if len(number) > 12:
             number = number[:12]
@@ -114,101 +117,161 @@ def generate_barcode(number, filename):
             number += ''.join(random.choices('0123456789', k=12 - len(number)))
         number += calculate_check_digit(number)
         
-        # Создаем свой класс writer с отключенным текстом
-        options = {
-            "module_width": 0.4,
-            "module_height": 10,
-            "quiet_zone": 3,
-            "font_size": 0,  # Устанавливаем размер шрифта в 0, чтобы отключить текст
-            "text_distance": 0,  # Устанавливаем расстояние текста в 0
-            "write_text": False  # Отключаем отрисовку текста
-        }
-        
-        ean = barcode.get_barcode_class("ean13")
-        ean_code = ean(number, writer=ImageWriter())
-        path = ean_code.save(filename, options=options)
-        
-        logging.info(f"Штрихкод успешно создан: {path}")
-        return path
+        logging.debug(f"Номер EAN-13 после нормализации: {number}")
+        return number
         
     except Exception as e:
-        logging.error(f"Ошибка при генерации штрихкода: {str(e)}\n{traceback.format_exc()}")
+        logging.error(f"Ошибка при нормализации номера EAN-13: {str(e)}\n{traceback.format_exc()}")
         raise
 
 
+@lru_cache(maxsize=1)
+def _get_base_font():
+    """Загружает TTF-файл шрифта один раз за запуск"""
+    from PIL import ImageFont
+    return ImageFont.truetype(FONT_PATH, FONT_SIZE_MAX)
+
+
+@lru_cache(maxsize=512)
+def _get_font(size):
+    """Возвращает шрифт нужного размера без повторного чтения файла"""
+    return _get_base_font().font_variant(size=size)
+
+
+@lru_cache(maxsize=1)
+def _register_pdf_font():
+    """Регистрирует TTF-шрифт в reportlab один раз за запуск"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    pdfmetrics.registerFont(TTFont("CustomFont", FONT_PATH))
+
+
+@lru_cache(maxsize=1)
+def _get_sizing_draw():
+    """Возвращает переиспользуемый холст для измерения текста"""
+    from PIL import Image, ImageDraw
+    return ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+
+@lru_cache(maxsize=1)
+def _get_template_size():
+    """Возвращает размер шаблона визитки в пикселях (читается только заголовок)"""
+    from PIL import Image
+    with Image.open(TEMPLATE_PATH) as template:
+        return template.size
+
+
+@lru_cache(maxsize=1)
+def _get_front_layout():
+    """Вычисляет отступы и область текста лицевой стороны в пикселях шаблона"""
+    width, height = _get_template_size()
+    margin_x = int(TEXT_MARGIN / mm * width / CARD_WIDTH)
+    margin_y = int(TEXT_MARGIN / mm * height / CARD_HEIGHT)
+    max_width = width - 2 * margin_x
+    max_height = height // 3
+    fit_width = max_width - max_width / CARD_WIDTH * 2 * TEXT_MARGIN
+    return margin_x, margin_y, fit_width, max_height
+
+
 def fit_text(draw, text, max_width, max_height):
     """Подбирает размер шрифта, чтобы текст уместился"""
-    font_size = FONT_SIZE_MAX
-    font = ImageFont.truetype(FONT_PATH, font_size)
-
-    while True:
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        if text_width <= max_width and text_height <= max_height:
-            break
+    def measure(font_size):
+        bbox = draw.textbbox((0, 0), text, font=_get_font(font_size))
+        return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+    def fits(font_size):
+        text_width, text_height = measure(font_size)
+        return text_width <= max_width and text_height <= max_height
+
+    text_width, text_height = measure(FONT_SIZE_MAX)
+    if text_width <= max_width and text_height <= max_height:
+        return _get_font(FONT_SIZE_MAX)
+
+    # Размер текста почти пропорционален кеглю: оцениваем кегль по одному
+    # замеру на FONT_SIZE_MAX и уточняем его шагом 1 в обе стороны.
+    # Из-за хинтинга отдельный кегль может не поместиться, хотя следующий
+    # помещается, поэтому вверх проверяем на два шага вперед
+    scale = min(max_width / text_width if text_width else 1,
+                max_height / text_height if text_height else 1)
+    font_size = max(1, min(FONT_SIZE_MAX - 1, int(FONT_SIZE_MAX * scale)))
+    while font_size > 1 and not fits(font_size):
         font_size -= 1
-        font = ImageFont.truetype(FONT_PATH, font_size)
+    while font_size < FONT_SIZE_MAX - 1:
+        if fits(font_size + 1):
+            font_size += 1
+        elif font_size < FONT_SIZE_MAX - 2 and fits(font_size + 2):
+            font_size += 2
+        else:
+            break
+
+    return _get_font(font_size)
+
+
+def fit_text_pdf(text, max_width, max_height, font_name="CustomFont"):
+    """Подбирает размер шрифта reportlab по таблицам ширин, без растеризации"""
+    from reportlab.pdfbase import pdfmetrics
+    low, high, best = 1, FONT_SIZE_MAX, 1
+    while low <= high:
+        font_size = (low + high) // 2
+        text_width = pdfmetrics.stringWidth(text, font_name, font_size)
+        if text_width <= max_width and font_size <= max_height:
+            best = font_size
+            low = font_size + 1
+        else:
+            high = font_size - 1
 
-    return font
+    return best
 
 
-def create_front_card(name, number, additional_info, output_filename):
-    """Создает изображение лицевой стороны визитки"""
+def draw_front_card(c, x, y, name, additional_info):
+    """Рисует лицевую сторону визитки: шаблон и векторный текст поверх него"""
     logging.info(f"Создание лицевой стороны для: {name}")
-    
+
     try:
-        if not os.path.exists(TEMPLATE_PATH):
-            error_msg = f"Файл шаблона не найден: {TEMPLATE_PATH}"
-            logging.error(error_msg)
-            raise FileNotFoundError(error_msg)
-        
-        if not os.path.exists(FONT_PATH):
-            error_msg = f"Файл шрифта не найден: {FONT_PATH}"
-            logging.error(error_msg)
-            raise FileNotFoundError(error_msg)
+        # Шаблон встраивается в PDF один раз и переиспользуется для всех карточек
+        c.drawImage(TEMPLATE_PATH, x, y, CARD_WIDTH, CARD_HEIGHT, mask="auto")
 
-        template = Image.open(TEMPLATE_PATH).convert("RGBA")
-        logging.debug(f"Шаблон загружен, размер: {template.size}")
-        
-        draw = ImageDraw.Draw(template)
+        width, height = _get_template_size()
+        draw = _get_sizing_draw()
 
         # Извлекаем второе слово из имени
-        second_word = name.split()[1] if len(name.split()) > 1 else name
+        name_parts = name.split()
+        second_word = name_parts[1] if len(name_parts) > 1 else name
 
-        # Определяем максимальную область для текста
-        max_width = template.width - 2 * int(TEXT_MARGIN / mm * template.width / CARD_WIDTH)
-        max_height = template.height // 3
+        # Отступы и максимальная область для текста одинаковы для всех карточек
+        margin_x, margin_y, max_width, max_height = _get_front_layout()
 
-        # Используем начальный размер шрифта 200
-        font_size = 300
-        font = ImageFont.truetype(FONT_PATH, font_size)
-        font = fit_text(draw, second_word, max_width - max_width / CARD_WIDTH * 2 * TEXT_MARGIN, max_height)
+        font = fit_text(draw, second_word, max_width, max_height)
 
         bbox = draw.textbbox((0, 0), second_word, font=font)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
-        text_x = (template.width - text_width) // 2
-        text_y = (template.height - text_height) // 2 + 80
+        text_x = (width - text_width) // 2
+        text_y = (height - text_height) // 2 + 80
 
-        # Рисуем текст синим цветом
-        draw.text((text_x, text_y), second_word, font=font, fill=(57, 171, 226, 255))
-
-        # Добавляем дополнительную информацию в нижний правый угол
+        # Дополнительная информация в нижнем правом углу
         additional_font_size = 100
-        additional_font = ImageFont.truetype(FONT_PATH, additional_font_size)
+        additional_font = _get_font(additional_font_size)
         additional_bbox = draw.textbbox((0, 0), additional_info, font=additional_font)
         additional_text_width = additional_bbox[2] - additional_bbox[0]
         additional_text_height = additional_bbox[3] - additional_bbox[1]
-        additional_text_x = template.width - additional_text_width - int(TEXT_MARGIN / mm * template.width / CARD_WIDTH)
-        additional_text_y = template.height - additional_text_height - int(TEXT_MARGIN / mm * template.height / CARD_HEIGHT)
-
-        draw.text((additional_text_x, additional_text_y), additional_info, font=additional_font, fill=(57, 171, 226, 255))
+        additional_text_x = width - additional_text_width - margin_x
+        additional_text_y = height - additional_text_height - margin_y
+
+        # Текст рисуется в пиксельных координатах шаблона, растянутых так же,
+        # как сам шаблон. PIL отсчитывает y сверху от линии асцендера,
+        # reportlab - снизу от базовой линии.
+        c.saveState()
+        c.translate(x, y)
+        c.scale(CARD_WIDTH / width, CARD_HEIGHT / height)
+        c.setFillColorRGB(57 / 255, 171 / 255, 226 / 255)
+        c.setFont("CustomFont", font.size)
+        c.drawString(text_x, height - text_y - font.getmetrics()[0], second_word)
+        c.setFont("CustomFont", additional_font_size)
+        c.drawString(additional_text_x, height - additional_text_y - additional_font.getmetrics()[0],
+                     additional_info)
+        c.restoreState()
 
-        template.save(output_filename)
-        logging.info(f"Карточка успешно сохранена: {output_filename}")
-        return output_filename
-        
     except Exception as e:
         logging.error(f"Ошибка при создании лицевой стороны визитки: {str(e)}\n{traceback.format_exc()}")
         raise
@@ -216,26 +279,28 @@ def create_front_card(name, number, additional_info, output_filename):
 
 def draw_barcode_card(c, x, y, name, number):
     """Рисует карточку со штрихкодом"""
+    from reportlab.graphics import renderPDF
+    from reportlab.graphics.barcode.eanbc import Ean13BarcodeWidget
+    from reportlab.graphics.shapes import Drawing
     try:
         c.setStrokeColorRGB(0, 0, 0)
         c.rect(x, y, CARD_WIDTH, CARD_HEIGHT, fill=0)
 
         # Используем тот же шрифт и цвет, что и для первой стороны
-        font_size = 200
-        font = ImageFont.truetype(FONT_PATH, font_size)
         # Подбираем размер шрифта для текста
-        draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
-        font = fit_text(draw, name, CARD_WIDTH - 2 * TEXT_MARGIN, CARD_HEIGHT / 3)
-        pdfmetrics.registerFont(TTFont("CustomFont", FONT_PATH))
-        c.setFont("CustomFont", font.size)
+        font_size = fit_text_pdf(name, CARD_WIDTH - 2 * TEXT_MARGIN, CARD_HEIGHT / 3)
+        c.setFont("CustomFont", font_size)
         c.drawCentredString(x + CARD_WIDTH / 2, y + CARD_HEIGHT - 50, name)
 
-        # Генерируем штрихкод
-        barcode_path = generate_barcode(number, f"barcode_{number}.png")
-        # Размещаем штрихкод
+        # Рисуем штрихкод векторно, без промежуточного растрового изображения
         barcode_width = (CARD_WIDTH - 20)
         barcode_height = 80
-        c.drawImage(barcode_path, x + 10, y + 15, barcode_width, barcode_height, preserveAspectRatio=True, mask="auto")
+        widget = Ean13BarcodeWidget(value=normalize_ean13(number), humanReadable=0)
+        widget.barWidth *= barcode_width / widget.width  # Растягиваем на всю ширину
+        widget.barHeight = barcode_height * 2 / 3
+        widget.y = (barcode_height - widget.barHeight) / 2
+        drawing = Drawing(barcode_width, barcode_height, widget)
+        renderPDF.draw(drawing, c, x + 10, y + 15)
         
         # Добавляем номер штрихкода под изображением
         c.setFont("CustomFont", 8)  # Устанавливаем маленький размер шрифта для номера
@@ -248,6 +313,8 @@ def draw_barcode_card(c, x, y, name, number):
 
 def create_pdf(output_filename, debug_mode):
     """Создает PDF с карточками"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
     if debug_mode:
         logging.info("Начало создания PDF файла")
     
@@ -260,23 +327,21 @@ def create_pdf(output_filename, debug_mode):
             print(f"- {name}: {number}")
         print()
         
+        # Координата Y строки карточек одинакова для обеих страниц
+        # (1 мм отступа между карточками)
+        rows_y = [Y_START - (i // 2) * (Y_STEP + 1 * mm) for i in range(len(data))]
+
+        _register_pdf_font()
         c = canvas.Canvas(output_filename, pagesize=A4)
-        temp_files = []
         
         if debug_mode:
             logging.info("Создание первой страницы (лицевая сторона)")
         
         logging.info("Создание первой страницы (лицевая сторона)")
-        y = Y_START
         for i, (name, number, additional_info) in enumerate(data):
             try:
                 x = X_POSITIONS[i % 2]
-                front_card_path = create_front_card(name, number, additional_info, f"front_{i}.png")
-                temp_files.append(front_card_path)
-                c.drawImage(front_card_path, x, y, CARD_WIDTH, CARD_HEIGHT, mask="auto")
-                
-                if (i + 1) % 2 == 0:
-                    y -= (Y_STEP + 1 * mm)
+                draw_front_card(c, x, rows_y[i], name, additional_info)
             except Exception as e:
                 logging.error(f"Ошибка при обработке карточки {i} ({name}): {str(e)}")
                 raise
@@ -284,16 +349,10 @@ def create_pdf(output_filename, debug_mode):
         c.showPage()
         
         logging.info("Создание второй страницы (штрихкоды)")
-        y = Y_START
         for i, (name, number, additional_info) in enumerate(data):
             # Swap the positions of the cards in rows
             x = X_POSITIONS[(i + 1) % 2]
-            barcode_path = generate_barcode(number, f"barcode_{number}.png")
-            temp_files.append(barcode_path)
-            draw_barcode_card(c, x, y, name, number)
-
-            if (i + 1) % 2 == 0:
-                y -= (Y_STEP + 1 * mm)  # Добавляем отступ 1 мм между карточками
+            draw_barcode_card(c, x, rows_y[i], name, number)
 
         c.showPage()
         c.save()
@@ -302,15 +361,7 @@ def create_pdf(output_filename, debug_mode):
             logging.info(f"PDF файл успешно создан: {output_filename}")
         else:
             print(f"\nФайл {output_filename} успешно создан!")
-            
-        # Удаление временных файлов
-        for temp_file in temp_files:
-            try:
-                os.remove(temp_file)
-                logging.debug(f"Удален временный файл: {temp_file}")
-            except OSError as e:
-                logging.warning(f"Не удалось удалить временный файл {temp_file}: {e}")
-                
+
     except Exception as e:
         if debug_mode:
             logging.error(f"Критическая ошибка при создании PDF: {str(e)}\n{traceback.format_exc()}")